@@ -1,9 +1,17 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from logging import getLogger
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = getLogger(__name__)
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
@@ -11,8 +19,62 @@ if not DATABASE_URL:
     logger.error("DATABASE_URL environment variable not set.")
     raise ValueError("DATABASE_URL environment variable not set.")
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _json_serializer(obj):
+    """JSONカラムの値をorjsonでシリアライズします。SQLAlchemyは文字列を要求するためデコードして返します。"""
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+def _engine_options(url):
+    """接続先のDBドライバに応じて、create_engineに渡すオプションを組み立てます。"""
+    options = {
+        # 分析結果の一括INSERTを、1ステートメントあたり最大10000行のバッチで実行する
+        "insertmanyvalues_page_size": 10000,
+        # 同じ形のクエリを繰り返し発行するため、コンパイル済みSQLのキャッシュを大きめに取る
+        "query_cache_size": 1200,
+        "future": True,
+    }
+    is_sqlite = url.get_backend_name() == "sqlite"
+    if is_sqlite and url.database in (None, "", ":memory:"):
+        # インメモリSQLiteは接続ごとに別のDBになるため、全体で1つの接続を共有する
+        options["poolclass"] = StaticPool
+    else:
+        # リクエストやバックグラウンドタスクごとにセッションを開閉するため、接続はプールして使い回す。
+        # 同時リクエストが増えても待ちが発生しにくいよう多めに確保し、切断された接続は使用前に検出する
+        options.update(
+            pool_size=20,
+            max_overflow=10,
+            pool_timeout=30,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+        )
+    if is_sqlite and url.drivername in ("sqlite", "sqlite+pysqlite"):
+        # プールした接続は別スレッドから使われるため、sqlite3の同一スレッド制約を外す
+        options["connect_args"] = {"check_same_thread": False}
+    if url.drivername in ("postgresql", "postgresql+psycopg2"):
+        options["executemany_mode"] = "values_plus_batch"
+    # signals / parameters_used などのJSONカラムは標準のjsonモジュールではなくorjsonで変換する
+    if orjson is not None:
+        options["json_serializer"] = _json_serializer
+        options["json_deserializer"] = orjson.loads
+    return options
+
+def _async_url(url):
+    """同期ドライバのURLを、同じDBに接続する非同期ドライバ (asyncpg / aiosqlite) のURLに変換します。"""
+    backend = url.get_backend_name()
+    if backend == "postgresql":
+        return url.set(drivername="postgresql+asyncpg")
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    return url
+
+# 分析タスク（スレッド/プロセスで実行する同期処理）用のエンジン
+engine = create_engine(DATABASE_URL, **_engine_options(make_url(DATABASE_URL)))
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# APIエンドポイント用の非同期エンジン。クエリ待ちの間もイベントループをブロックしない
+_async_database_url = _async_url(make_url(DATABASE_URL))
+async_engine = create_async_engine(_async_database_url, **_engine_options(_async_database_url))
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -25,3 +87,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    """
+    非同期のデータベースセッションを提供するDependency。
+    リクエストの開始時にセッションを作成し、終了時にクローズします。
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -2,10 +2,14 @@ import logging
 from sqlalchemy.orm import Session
 
 from .getTickersData import get_tickers_data
+from .stocks import invalidate_latest_run_cache, invalidate_search_cache
 from ..models.db_models import AnalysisResult, AnalysisRun
 
 def save_results_to_db(db: Session, results: dict, params: dict):
-    """分析結果をデータベースに保存します。"""
+    """分析結果をデータベースに保存します。
+
+    results の各辞書には、保存時に analysis_run_id が書き込まれます。
+    """
     logging.info(f"Saving {len(results)} analysis results to the database...")
     try:
         # 1. 分析実行の記録を作成
@@ -13,27 +17,14 @@ def save_results_to_db(db: Session, results: dict, params: dict):
         db.add(analysis_run)
         db.flush() # run.id を確定させる
 
-        # 2. 各銘柄の分析結果を、上記の実行記録に紐づけて保存
-        for ticker, data in results.items():
-            result = AnalysisResult(
-                analysis_run_id=analysis_run.id,
-                ticker=data["ticker"],
-                price=float(data["price"]),
-                rsi=float(data["rsi"]),
-                deviation_rate_25=float(data["deviation_rate_25"]),
-                trend=data["trend"],
-                macd_line=float(data["MACD"]["line"]),
-                macd_signal=float(data["MACD"]["signal"]),
-                dmi_dmp=float(data["DMI"]["dmp"]),
-                dmi_dmn=float(data["DMI"]["dmn"]),
-                adx=float(data["ADX"]),
-                volume=int(data["Volume"]),
-                signals=data["signals"],
-                buy_score=int(data["buy_score"]),
-                short_score=int(data["short_score"]),
-            )
-            db.add(result)
-        
+        # 2. 各銘柄の分析結果を、上記の実行記録に紐づけて一括で保存
+        #    結果の辞書はカラム名と同じキーを持つため、ORMインスタンスを生成せずそのままexecutemanyで挿入する
+        #    （parameters_used など AnalysisResult のカラムに無いキーは無視される）。
+        #    行ごとに辞書をコピーせず、実行IDは元の辞書に直接書き込む
+        for data in results.values():
+            data["analysis_run_id"] = analysis_run.id
+        db.bulk_insert_mappings(AnalysisResult, list(results.values()))
+
         db.commit()
         logging.info(f"Successfully saved analysis run {analysis_run.id} and {len(results)} results to the database.")
     except Exception as e:
@@ -62,6 +53,9 @@ def run_analysis_task(db: Session):
         
         # データベースに保存
         save_results_to_db(db, raw_data, params_used)
+        # 検索APIがキャッシュしている最新の分析実行と検索結果を破棄し、今回の結果を参照させる
+        invalidate_latest_run_cache()
+        invalidate_search_cache()
         
         logging.info("Stock analysis task finished successfully.")
     except Exception as e:
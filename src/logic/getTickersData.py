@@ -1,19 +1,61 @@
 import sys
 import os
+import time
+import hashlib
+import itertools
 import yfinance as yf
 import json
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 import logging
+import multiprocessing
+import threading
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime, date
 from sqlalchemy.orm import Session
 from sqlalchemy import desc, func # funcをインポート
 from ..models.db_models import TuningParameter
 
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """numbaが無い環境向けに、関数をそのまま返す（純Pythonで実行する）デコレータ。"""
+        return lambda func: func
+
 warnings.filterwarnings("ignore", category=FutureWarning)
 
+logger = logging.getLogger(__name__)
+
 TARGET_TIME = os.environ.get("TARGET_TIME", '15:00')
+_TARGET_TIME_ONLY = pd.Timestamp(TARGET_TIME).time()
+ANALYSIS_MAX_WORKERS = os.cpu_count()
+# 履歴状態を計算し直す銘柄がこの数以上の場合のみプロセスプールで並列計算する。
+# 1銘柄の計算は履歴状態の再計算込みでも数十マイクロ秒なのに対し、ワーカーの起動には1プロセスあたり0.7秒程度
+# （pandas・SQLAlchemy・numbaキャッシュ等の読み込み）かかるため、通常の銘柄数では同じプロセス内で計算する方が速い
+ANALYSIS_POOL_MIN_MISSES = int(os.environ.get("ANALYSIS_POOL_MIN_MISSES", 50000))
+# 分析のワーカープロセスの起動方式。APIサーバーはスレッドを多数持つため、forkではなく単一スレッドのサーバープロセスから起動する
+# （fork時に他のスレッドが保持していたロックが子プロセスで解放されず、デッドロックするのを避ける）
+_MP_CONTEXT = multiprocessing.get_context("forkserver")
+DOWNLOAD_CHUNK_SIZE = 50
+CACHE_DIR = os.environ.get("CACHE_DIR", "data/cache")
+DOWNLOAD_CACHE_TTL = int(os.environ.get("DOWNLOAD_CACHE_TTL", 900)) # 秒
+# score_metrics で配列化する指標の一覧
+_INDICATOR_FIELDS = ("price", "rsi", "sma_25", "sma_75", "previous_sma_75", "macd_line", "macd_signal", "adx", "dmp", "dmn", "volume")
+
+# シグナルごとの (分岐ごとのラベル, 買いスコア加点, 空売りスコア加点)。最後の要素はどの条件にも該当しない場合。
+_SIGNAL_TABLE = {
+    'RSI': (np.array(['買い', '買い準備', '売り', '売り準備', '中立']), np.array([2, 1, 0, 0, 0]), np.array([0, 0, 2, 1, 0])),
+    'Divergence_25d': (np.array(['買い', '売り', '中立']), np.array([2, 0, 0]), np.array([0, 2, 0])),
+    'MA75_Trend': (np.array(['Upward', 'Downward', 'No change']), np.array([1, 0, 0]), np.array([0, 1, 0])),
+    'MACD': (np.array(['買い', '売り']), np.array([2, 0]), np.array([0, 2])),
+    'DMI': (np.array(['ゴールデンクロス', 'デッドクロス']), np.array([2, 0]), np.array([0, 2])),
+    'ADX': (np.array(['強い上昇トレンド', '強い下降トレンド', 'トレンドレス']), np.array([1, 0, 0]), np.array([0, 1, 0])),
+}
+
 # logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s') # Removed
 
 DEFAULT_PARAMS = {
@@ -33,21 +75,33 @@ DEFAULT_PARAMS = {
     "adx_threshold": 25
 }
 
+# get_tuning_parameters の当日分キャッシュ。DBから取得できた場合のみ格納する（デフォルト値への退避はキャッシュしない）
+_param_cache = {"date": None, "params": None}
+_param_cache_lock = threading.Lock()
+
 def get_tuning_parameters(db: Session) -> dict:
-    """データベースから最新日付のチューニングパラメータを取得します。存在しない場合はデフォルト値を設定します。"""
-    logging.info("Fetching tuning parameters from database...")
+    """データベースから最新日付のチューニングパラメータを取得します。存在しない場合はデフォルト値を設定します。
+
+    パラメータの更新は高々1日1回のため、取得結果はプロセス内で当日中キャッシュします。
+    """
+    today = date.today()
+    with _param_cache_lock:
+        if _param_cache["date"] == today:
+            logger.info("Using cached tuning parameters for date: %s", _param_cache['params']['date'])
+            return dict(_param_cache["params"])
+
+    logger.info("Fetching tuning parameters from database...")
     params = {}
     try:
         latest_date = db.query(func.max(TuningParameter.date)).scalar()
 
         if not latest_date:
-            logging.info("No tuning parameters found in DB. Seeding with default values for today.")
-            today = date.today()
+            logger.info("No tuning parameters found in DB. Seeding with default values for today.")
             for name, value in DEFAULT_PARAMS.items():
                 param = TuningParameter(date=today, name=name, value=value, description="Default value")
                 db.add(param)
             db.commit()
-            logging.info(f"Seeded default parameters for date: {today}")
+            logger.info("Seeded default parameters for date: %s", today)
             latest_date = today
 
         parameters = db.query(TuningParameter).filter(TuningParameter.date == latest_date).all()
@@ -61,174 +115,661 @@ def get_tuning_parameters(db: Session) -> dict:
         
         # パラメータセットに日付も追加しておく
         params['date'] = latest_date.isoformat()
-        logging.info(f"Successfully loaded tuning parameters for date: {latest_date}")
+        logger.info("Successfully loaded tuning parameters for date: %s", latest_date)
+        with _param_cache_lock:
+            _param_cache.update(date=today, params=dict(params))
         return params
     except Exception as e:
         db.rollback()
-        logging.error(f"Failed to get tuning parameters from DB, using default values. Error: {e}")
+        logger.error("Failed to get tuning parameters from DB, using default values. Error: %s", e)
         return DEFAULT_PARAMS
 
 
 def read_tickers_from_csv(csv_path='/app/data/csv/tickers.csv'):
     """CSVファイルからティッカーシンボルのリストを読み込みます。"""
-    logging.info(f"Reading tickers from {csv_path}...")
+    logger.info("Reading tickers from %s...", csv_path)
     try:
-        df = pd.read_csv(csv_path, header=None, dtype=str)
-        tickers = df[0].dropna().tolist()
-        logging.info(f"Successfully read {len(tickers)} tickers from CSV.")
+        # 1列だけのテキストファイルなので、pandasを介さず各行の先頭フィールドを読む
+        with open(csv_path, encoding='utf-8') as f:
+            tickers = [field for field in (line.split(',', 1)[0].strip() for line in f) if field]
+        logger.info("Successfully read %d tickers from CSV.", len(tickers))
         return tickers
     except Exception as e:
-        logging.error(f"Error reading CSV file: {e}")
+        logger.error("Error reading CSV file: %s", e)
         return None
 
+def _download_cache_path(tickers, period, interval):
+    """ダウンロード結果のキャッシュファイルパスを (日付, ティッカー一覧, 期間, 間隔) から決定します。"""
+    today = date.today().isoformat()
+    key = hashlib.md5((today + ','.join(sorted(tickers)) + period + interval).encode()).hexdigest()
+    return os.path.join(CACHE_DIR, f"yfcache_{today}_{key}.parquet")
+
+def _remove_stale_cache_files(prefix):
+    """CACHE_DIR 内の prefix で始まるキャッシュファイルのうち、当日分以外（前日以前）のものを削除します。"""
+    current_prefix = f"{prefix}{date.today().isoformat()}"
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(prefix) and not name.startswith(current_prefix):
+            try:
+                os.remove(os.path.join(CACHE_DIR, name))
+            except OSError as e:
+                logger.warning("Failed to remove stale cache file %s. Error: %s", name, e)
+
+def _download_chunked(tickers, period, interval):
+    """ティッカーを DOWNLOAD_CHUNK_SIZE 件ずつに分けて yf.download を並行実行し、列方向に結合します。"""
+    chunks = [tickers[i:i + DOWNLOAD_CHUNK_SIZE] for i in range(0, len(tickers), DOWNLOAD_CHUNK_SIZE)]
+
+    def download_chunk(chunk):
+        return yf.download(chunk, period=period, interval=interval, threads=True, progress=False, group_by='column')
+
+    with ThreadPoolExecutor(max_workers=max(1, len(chunks))) as executor:
+        frames = [data for data in executor.map(download_chunk, chunks) if data is not None and not data.empty]
+    if not frames:
+        return pd.DataFrame()
+    # チャンクごとに日付（行）が揃っているとは限らないため、結合後の行は明示的に時刻順に並べる
+    # （get_prices_at_time の二分探索や取引日の判定は、インデックスが昇順であることを前提とする）。
+    # 列は (項目, ティッカー) のMultiIndex。チャンクごとに並んだ列を項目単位にまとめ直す
+    return pd.concat(frames, axis=1, sort=True).sort_index(axis=1, level=0, sort_remaining=False)
+
+def _download_with_cache(tickers, period, interval):
+    """yf.downloadの結果をParquetにキャッシュし、有効期限内の再実行ではディスクから読み込みます。"""
+    cache_path = _download_cache_path(tickers, period, interval)
+    if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < DOWNLOAD_CACHE_TTL:
+        try:
+            data = pd.read_parquet(cache_path)
+            logger.info("Loaded %s stock data from cache: %s", interval, cache_path)
+            return data
+        except Exception as e:
+            logger.warning("Failed to read download cache %s, downloading again. Error: %s", cache_path, e)
+
+    data = _download_chunked(tickers, period, interval)
+    if data is not None and not data.empty:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            data.to_parquet(cache_path)
+            # キャッシュは当日分しか使わないため、前日以前のファイルは書き込みのたびに削除する
+            _remove_stale_cache_files("yfcache_")
+        except Exception as e:
+            logger.warning("Failed to write download cache %s. Error: %s", cache_path, e)
+    return data
+
+def to_yf_tickers(tickers):
+    """ティッカーをyfinance形式に変換します。指数（'^'始まり）以外には東証の '.T' を付けます。"""
+    arr = np.array(tickers, dtype=str)
+    return np.where(np.char.startswith(arr, '^'), arr, np.char.add(arr, '.T')).tolist()
+
 def download_stock_data(tickers, period="100d", interval="1d"):
-    """yfinanceを使用して、指定されたティッカーリストの株価データをダウンロードします。"""
-    logging.info(f"Downloading stock data for {len(tickers)} tickers...")
+    """yfinanceを使用して、指定されたティッカーリストの株価データをダウンロードします。
+
+    日足と当日の分足は互いに独立しているため、2つのダウンロードを並行して実行します。
+    """
+    logger.info("Downloading stock data for %d tickers...", len(tickers))
     try:
-        multi_data = yf.download(tickers, period=period, interval=interval)
-        intra_day_data = yf.download(tickers, period="1d", interval="1m")
-        logging.info("Stock data download successful.")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            multi_future = executor.submit(_download_with_cache, tickers, period, interval)
+            intra_day_future = executor.submit(_download_with_cache, tickers, "1d", "1m")
+            multi_data = multi_future.result()
+            intra_day_data = intra_day_future.result()
+        logger.info("Stock data download successful.")
         return multi_data, intra_day_data
     except Exception as e:
-        logging.error(f"Error downloading stock data: {e}")
+        logger.error("Error downloading stock data: %s", e)
         return None, None
 
-def calculate_metrics_for_ticker(ticker, multi_data, intra_day_data, params):
-    """単一のティッカーについて、各種テクニカル指標と総合スコアを計算します。"""
-    logging.debug(f"Calculating metrics for {ticker}...")
+def get_prices_at_time(close_intra, target_ts):
+    """当日の分足終値から、全銘柄のTARGET_TIME時点（存在しない場合は直前）の株価をまとめて取得します。
+
+    Args:
+        close_intra (pd.DataFrame | None): 分足データの 'Close'（列が銘柄）。分足データが無い場合はNone。
+        target_ts (pd.Timestamp): 分足データの取引日におけるTARGET_TIME。
+
+    Returns:
+        dict: yfinance形式のティッカーをキー、株価を値とする辞書。該当する足が無い銘柄は含みません。
+    """
+    if close_intra is None:
+        return {}
+    # インデックスは時刻順に並んでいるため、TARGET_TIME以下の足の範囲を二分探索で一度だけ求める
+    end = close_intra.index.searchsorted(target_ts, side='right')
+    if end == 0:
+        return {}
+    values = close_intra.to_numpy(dtype=np.float64)[:end]
+    has_value = ~np.isnan(values)
+    # 各列（銘柄）で値のある最後の行
+    last_row = end - 1 - np.argmax(has_value[::-1], axis=0)
+    prices = values[last_row, np.arange(values.shape[1])]
+    found = has_value.any(axis=0)
+    return dict(zip(close_intra.columns[found], prices[found].tolist()))
+
+def _state_params_key(params):
+    """履歴状態の計算に使うパラメータを1つの文字列キーにまとめます。"""
+    return "-".join(str(params[name]) for name in ("rsi_length", "sma_short_length", "sma_long_length", "macd_fast", "macd_slow", "macd_signal", "adx_length"))
+
+def _history_key(high_history, low_history, close_history):
+    """履歴状態の妥当性確認に使う (本数, 終値の合計, 最終終値, 高値の合計, 安値の合計) を返します。
+
+    ADX/DMIの状態は高値・安値から求めるため、高値・安値の修正も検出できるようにそれぞれの合計も含めます。
+    """
+    close_history = np.asarray(close_history, dtype=np.float64)
+    return (
+        len(close_history), float(close_history.sum()), float(close_history[-1]),
+        float(np.asarray(high_history, dtype=np.float64).sum()), float(np.asarray(low_history, dtype=np.float64).sum()),
+    )
+
+@njit(cache=True)
+def _adx_step(t, adx_length, high, low, prev_high, prev_low, prev_close, tr, plus_dm, minus_dm, adx):
+    """TA-LibのADX/PLUS_DI/MINUS_DIと同じ手順で、t本目（t >= 1）の足を1本分反映します。
+
+    最初の (adx_length - 1) 本はTR/+DM/-DMを単純合計し、以降はWilderの平滑化を行います。
+    adx は 2*adx_length - 1 本目まではDXの合計、それ以降はADXそのものを保持します。
+
+    Returns:
+        tuple: 更新後の (tr, plus_dm, minus_dm, adx) と、この足の (adx, +DI, -DI)。値が無い場合はNaN。
+    """
+    diff_p = high - prev_high
+    diff_m = prev_low - low
+    dm_p = 0.0
+    dm_m = 0.0
+    if diff_m > 0 and diff_p < diff_m:
+        dm_m = diff_m
+    elif diff_p > 0 and diff_p > diff_m:
+        dm_p = diff_p
+    true_range = max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+    if t < adx_length:
+        return tr + true_range, plus_dm + dm_p, minus_dm + dm_m, adx, np.nan, np.nan, np.nan
+
+    tr = tr - tr / adx_length + true_range
+    plus_dm = plus_dm - plus_dm / adx_length + dm_p
+    minus_dm = minus_dm - minus_dm / adx_length + dm_m
+
+    dmp = 0.0
+    dmn = 0.0
+    has_dx = False
+    dx = 0.0
+    if abs(tr) >= 1e-14:
+        dmp = 100.0 * plus_dm / tr
+        dmn = 100.0 * minus_dm / tr
+        if abs(dmp + dmn) >= 1e-14:
+            has_dx = True
+            dx = 100.0 * abs(dmp - dmn) / (dmp + dmn)
+
+    last_dx_bar = 2 * adx_length - 1
+    if t < last_dx_bar:
+        if has_dx:
+            adx += dx
+        return tr, plus_dm, minus_dm, adx, np.nan, dmp, dmn
+    if t == last_dx_bar:
+        if has_dx:
+            adx += dx
+        adx /= adx_length
+    elif has_dx:
+        adx = (adx * (adx_length - 1) + dx) / adx_length
+    return tr, plus_dm, minus_dm, adx, adx, dmp, dmn
+
+@njit(cache=True)
+def _history_state_kernel(high, low, close, rsi_length, sma_short_length, sma_long_length, macd_fast, macd_slow, macd_signal_length, adx_length):
+    """最終足を除いた日足の履歴を1回だけ走査し、RSI/SMA/MACD/ADXの更新に必要な状態をまとめて求めます。
+
+    RSI（Wilderの平滑化）とEMAは、TA-Libと同じく最初の期間分の単純平均を初期値とします。
+    """
+    n = len(close)
+    nan = np.nan
+    gain_sum = loss_sum = 0.0
+    avg_gain = avg_loss = nan
+    fast_sum = slow_sum = signal_sum = 0.0
+    ema_fast = ema_slow = macd_signal = nan
+    sma_short_sum = sma_long_sum = previous_sma_long = 0.0
+    tr = plus_dm = minus_dm = adx = 0.0
+    alpha_fast = 2.0 / (macd_fast + 1)
+    alpha_slow = 2.0 / (macd_slow + 1)
+    alpha_signal = 2.0 / (macd_signal_length + 1)
+
+    for t in range(n):
+        price = close[t]
+
+        if t >= 1:
+            delta = price - close[t - 1]
+            gain = max(delta, 0.0)
+            loss = max(-delta, 0.0)
+            if t <= rsi_length:
+                gain_sum += gain
+                loss_sum += loss
+                if t == rsi_length:
+                    avg_gain = gain_sum / rsi_length
+                    avg_loss = loss_sum / rsi_length
+            else:
+                avg_gain = (avg_gain * (rsi_length - 1) + gain) / rsi_length
+                avg_loss = (avg_loss * (rsi_length - 1) + loss) / rsi_length
+
+            tr, plus_dm, minus_dm, adx, _, _, _ = _adx_step(t, adx_length, high[t], low[t], high[t - 1], low[t - 1], close[t - 1], tr, plus_dm, minus_dm, adx)
+
+        # SMAは最終足を加えれば期間分になるよう、直近 (期間-1) 本の合計を持つ
+        if t >= n - (sma_short_length - 1):
+            sma_short_sum += price
+        if t >= n - (sma_long_length - 1):
+            sma_long_sum += price
+        if t >= n - sma_long_length:
+            previous_sma_long += price
+
+        if t < macd_fast:
+            fast_sum += price
+            if t == macd_fast - 1:
+                ema_fast = fast_sum / macd_fast
+        else:
+            ema_fast += alpha_fast * (price - ema_fast)
+        if t < macd_slow:
+            slow_sum += price
+            if t == macd_slow - 1:
+                ema_slow = slow_sum / macd_slow
+        else:
+            ema_slow += alpha_slow * (price - ema_slow)
+
+        # MACDラインは長期EMAが揃った足から始まり、そのEMAがシグナル
+        k = t - (macd_slow - 1)
+        if k >= 0:
+            macd_line = ema_fast - ema_slow
+            if k < macd_signal_length:
+                signal_sum += macd_line
+                if k == macd_signal_length - 1:
+                    macd_signal = signal_sum / macd_signal_length
+            else:
+                macd_signal += alpha_signal * (macd_line - macd_signal)
+
+    if n < sma_long_length:
+        previous_sma_long = nan
+    else:
+        previous_sma_long /= sma_long_length
+    return avg_gain, avg_loss, sma_short_sum, sma_long_sum, previous_sma_long, ema_fast, ema_slow, macd_signal, tr, plus_dm, minus_dm, adx
+
+def compute_history_state(high_history, low_history, close_history, params):
+    """最終足を除いた日足の履歴から、RSI/SMA/MACD/ADXを最終足の値だけで更新するための状態を求めます。
+
+    最終足の価格（TARGET_TIME時点の株価）や高値・安値は日中に変わるが、それ以前の足は当日中変わらないため、
+    この状態は当日の再実行でそのまま再利用できます。
+    """
+    n_history, close_sum, last_close, high_sum, low_sum = _history_key(high_history, low_history, close_history)
+    (avg_gain, avg_loss, sma_short_sum, sma_long_sum, previous_sma_long,
+     ema_fast, ema_slow, macd_signal, tr, plus_dm, minus_dm, adx) = _history_state_kernel(
+        np.asarray(high_history, dtype=np.float64),
+        np.asarray(low_history, dtype=np.float64),
+        np.asarray(close_history, dtype=np.float64),
+        *(int(params[name]) for name in ("rsi_length", "sma_short_length", "sma_long_length", "macd_fast", "macd_slow", "macd_signal", "adx_length")),
+    )
+    return {
+        "params_key": _state_params_key(params),
+        "n_history": n_history,
+        "close_sum": close_sum,
+        "high_sum": high_sum,
+        "low_sum": low_sum,
+        "last_close": last_close,
+        "last_high": float(high_history[-1]),
+        "last_low": float(low_history[-1]),
+        "avg_gain": float(avg_gain),
+        "avg_loss": float(avg_loss),
+        "sma_short_sum": float(sma_short_sum),
+        "sma_long_sum": float(sma_long_sum),
+        "previous_sma_long": float(previous_sma_long),
+        "ema_fast": float(ema_fast),
+        "ema_slow": float(ema_slow),
+        "macd_signal": float(macd_signal),
+        "adx_tr": float(tr),
+        "adx_plus_dm": float(plus_dm),
+        "adx_minus_dm": float(minus_dm),
+        "adx": float(adx),
+    }
+
+def is_history_state_valid(state, high_history, low_history, close_history, params):
+    """キャッシュされた履歴状態が、今回の履歴データとパラメータに対応しているかを確認します。"""
+    return (
+        state is not None
+        and state["params_key"] == _state_params_key(params)
+        # 高値・安値の合計を持たない古い形式の状態は無効とみなす
+        and (state["n_history"], state["close_sum"], state["last_close"], state.get("high_sum"), state.get("low_sum"))
+            == _history_key(high_history, low_history, close_history)
+    )
+
+def _apply_last_bar(state, price, high, low, params):
+    """履歴状態に最終足（価格・高値・安値）を1本分だけ反映し、各指標の最新値を返します。"""
+    rsi_length = params["rsi_length"]
+    delta = price - state["last_close"]
+    avg_gain = (state["avg_gain"] * (rsi_length - 1) + max(delta, 0.0)) / rsi_length
+    avg_loss = (state["avg_loss"] * (rsi_length - 1) + max(-delta, 0.0)) / rsi_length
+    rsi = 100.0 * avg_gain / (avg_gain + avg_loss) if avg_gain + avg_loss != 0 else 0.0
+
+    sma_short = (state["sma_short_sum"] + price) / params["sma_short_length"]
+    sma_long = (state["sma_long_sum"] + price) / params["sma_long_length"]
+
+    ema_fast = state["ema_fast"] + 2.0 / (params["macd_fast"] + 1) * (price - state["ema_fast"])
+    ema_slow = state["ema_slow"] + 2.0 / (params["macd_slow"] + 1) * (price - state["ema_slow"])
+    macd_line = ema_fast - ema_slow
+    macd_signal = state["macd_signal"] + 2.0 / (params["macd_signal"] + 1) * (macd_line - state["macd_signal"])
+
+    # ADXの最終足は前日終値を使うため、最終足の価格ではなく高値・安値だけに依存する
+    *_, adx, dmp, dmn = _adx_step(
+        state["n_history"], int(params["adx_length"]), float(high), float(low),
+        state["last_high"], state["last_low"], state["last_close"],
+        state["adx_tr"], state["adx_plus_dm"], state["adx_minus_dm"], state["adx"],
+    )
+
+    return rsi, sma_short, sma_long, state["previous_sma_long"], macd_line, macd_signal, adx, dmp, dmn
+
+def calculate_metrics_for_ticker(ticker, high, low, close, volume, price_at_time, params, state):
+    """単一のティッカーについて、各種テクニカル指標の最新値を計算します。
+
+    全指標を、最終足より前の履歴から求めた状態 (compute_history_state) に最終足の値を反映して求めます。
+    シグナル判定とスコアリングは、全銘柄分の指標が揃った後に score_metrics でまとめて行います。
+
+    Args:
+        ticker (str): yfinance形式のティッカーシンボル。
+        high, low, close (np.ndarray): 欠損を除いた日足の各項目（古い順の1次元配列）。
+            日数が sma_long_length 以上あることは呼び出し側で確認済みであること。
+        volume (float): 最終足の出来高。
+        price_at_time (float | None): TARGET_TIME時点の株価。Noneの場合は直近の終値を使用します。
+        params (dict): チューニングパラメータ。
+        state (dict): high[:-1], low[:-1], close[:-1] から compute_history_state で求めた履歴状態。
+    """
+    logger.debug("Calculating metrics for %s...", ticker)
     try:
-        df = pd.DataFrame({
-            'high': multi_data['High'][ticker],
-            'low': multi_data['Low'][ticker],
-            'close': multi_data['Close'][ticker],
-            'volume': multi_data['Volume'][ticker]
-        }).dropna()
-
-        if len(df) < params["sma_long_length"]:
-            logging.warning(f"Skipping {ticker}: insufficient data (less than {params['sma_long_length']} days).")
-            return None
+        if price_at_time is None:
+            price_at_time = close[-1]
 
-        price_at_time = df['close'].iloc[-1]
-        if not intra_day_data.empty and ticker in intra_day_data['Close'].columns:
-            data_today = intra_day_data['Close'][ticker].dropna()
-            if not data_today.empty:
-                target_time_data = data_today.at_time(pd.Timestamp(TARGET_TIME, tz='Asia/Tokyo').time())
-                if not target_time_data.empty:
-                    price_at_time = target_time_data.iloc[0]
-                else:
-                    closest_previous_time_data = data_today[data_today.index < pd.Timestamp(TARGET_TIME, tz='Asia/Tokyo')]
-                    if not closest_previous_time_data.empty:
-                        price_at_time = closest_previous_time_data.iloc[-1]
-        
-        df.loc[df.index[-1], 'close'] = price_at_time
-
-        # Calculate all indicators using pandas-ta
-        df.ta.rsi(length=params["rsi_length"], append=True)
-        df.ta.sma(length=params["sma_short_length"], append=True)
-        df.ta.sma(length=params["sma_long_length"], append=True)
-        df.ta.macd(fast=params["macd_fast"], slow=params["macd_slow"], signal=params["macd_signal"], append=True)
-        df.ta.adx(length=params["adx_length"], append=True)
-
-        # Extract latest values
-        latest = df.iloc[-1]
-        rsi = latest.get(f'RSI_{params["rsi_length"]}')
-        sma_25 = latest.get(f'SMA_{params["sma_short_length"]}')
-        sma_75 = latest.get(f'SMA_{params["sma_long_length"]}')
-        previous_sma_75 = df[f'SMA_{params["sma_long_length"]}'].iloc[-2]
-        macd_line = latest.get(f'MACD_{params["macd_fast"]}_{params["macd_slow"]}_{params["macd_signal"]}')
-        macd_signal_val = latest.get(f'MACDs_{params["macd_fast"]}_{params["macd_slow"]}_{params["macd_signal"]}')
-        adx = latest.get(f'ADX_{params["adx_length"]}')
-        dmp = latest.get(f'DMP_{params["adx_length"]}')
-        dmn = latest.get(f'DMN_{params["adx_length"]}')
-
-        if any(v is None for v in [rsi, sma_25, sma_75, macd_line, macd_signal_val, adx, dmp, dmn]):
-            logging.warning(f"Could not calculate all indicators for {ticker}. Skipping.")
-            return None
+        rsi, sma_25, sma_75, previous_sma_75, macd_line, macd_signal_val, adx, dmp, dmn = _apply_last_bar(
+            state, price_at_time, high[-1], low[-1], params
+        )
 
-        deviation_rate_25 = ((price_at_time - sma_25) / sma_25) * 100
-        trend = "Upward" if sma_75 > previous_sma_75 else "Downward" if sma_75 < previous_sma_75 else "No change"
-
-        # --- Signal Generation and Scoring ---
-        buy_score = 0
-        short_score = 0
-        signals = {}
-
-        # RSI Scoring
-        if rsi < params["rsi_buy_threshold"]: (signals['RSI'], buy_score) = ('買い', buy_score + 2)
-        elif params["rsi_buy_threshold"] <= rsi < params["rsi_buy_prepare_threshold"]: (signals['RSI'], buy_score) = ('買い準備', buy_score + 1)
-        elif rsi > params["rsi_sell_threshold"]: (signals['RSI'], short_score) = ('売り', short_score + 2)
-        elif params["rsi_sell_prepare_threshold"] <= rsi <= params["rsi_sell_threshold"]: (signals['RSI'], short_score) = ('売り準備', short_score + 1)
-        else: signals['RSI'] = '中立'
-
-        # 25-day Divergence Scoring
-        if deviation_rate_25 <= params["deviation_buy_threshold"]: (signals['Divergence_25d'], buy_score) = ('買い', buy_score + 2)
-        elif deviation_rate_25 >= params["deviation_sell_threshold"]: (signals['Divergence_25d'], short_score) = ('売り', short_score + 2)
-        else: signals['Divergence_25d'] = '中立'
-
-        # 75-day MA Trend Scoring
-        signals['MA75_Trend'] = trend
-        if trend == "Upward": buy_score += 1
-        elif trend == "Downward": short_score += 1
-
-        # MACD Scoring
-        if macd_line > macd_signal_val: (signals['MACD'], buy_score) = ('買い', buy_score + 2)
-        else: (signals['MACD'], short_score) = ('売り', short_score + 2)
-
-        # DMI Scoring
-        if dmp > dmn: (signals['DMI'], buy_score) = ('ゴールデンクロス', buy_score + 2)
-        else: (signals['DMI'], short_score) = ('デッドクロス', short_score + 2)
-        
-        # ADX Scoring
-        if adx > params["adx_threshold"] and dmp > dmn: (signals['ADX'], buy_score) = ('強い上昇トレンド', buy_score + 1)
-        elif adx > params["adx_threshold"] and dmp < dmn: (signals['ADX'], short_score) = ('強い下降トレンド', short_score + 1)
-        else: signals['ADX'] = 'トレンドレス'
+        if any(pd.isna(v) for v in [rsi, sma_25, sma_75, macd_line, macd_signal_val, adx, dmp, dmn]):
+            logger.warning("Could not calculate all indicators for %s. Skipping.", ticker)
+            return None
 
-        logging.debug(f"Successfully calculated metrics for {ticker}.")
+        logger.debug("Successfully calculated metrics for %s.", ticker)
         return {
             "ticker": ticker,
             "price": price_at_time,
             "rsi": rsi,
-            "deviation_rate_25": deviation_rate_25,
-            "trend": trend,
-            "MACD": {"line": macd_line, "signal": macd_signal_val},
-            "DMI": {"dmp": dmp, "dmn": dmn},
-            "ADX": adx,
-            "Volume": df['volume'].iloc[-1],
+            "sma_25": sma_25,
+            "sma_75": sma_75,
+            "previous_sma_75": previous_sma_75,
+            "macd_line": macd_line,
+            "macd_signal": macd_signal_val,
+            "adx": adx,
+            "dmp": dmp,
+            "dmn": dmn,
+            "volume": volume,
+        }
+    except Exception as e:
+        logger.error("Error processing data for %s: %s", ticker, e)
+        return None
+
+def _bucket(conditions):
+    """if/elifの連鎖と同じ優先順位で、最初に成立した条件の番号を銘柄ごとに返します（どれも不成立なら len(conditions)）。"""
+    return np.select(conditions, np.arange(len(conditions)), default=len(conditions))
+
+def score_metrics(metrics_by_ticker, params):
+    """全銘柄の指標をNumPy配列にまとめ、シグナル判定と買い/空売りスコアをベクトル演算で一括計算します。
+
+    Args:
+        metrics_by_ticker (dict): ティッカーをキー、calculate_metrics_for_ticker の戻り値を値とする辞書。
+        params (dict): チューニングパラメータ。
+
+    Returns:
+        dict: ティッカーをキーとする、シグナルとスコアを含む分析結果の辞書。
+            各値のキーは AnalysisResult のカラム名に揃えてあり（parameters_used を除く）、そのままDBに保存できます。
+    """
+    if not metrics_by_ticker:
+        return {}
+
+    tickers = list(metrics_by_ticker)
+    columns = {
+        field: np.array([metrics_by_ticker[t][field] for t in tickers], dtype=np.float64)
+        for field in _INDICATOR_FIELDS
+    }
+    price, rsi = columns["price"], columns["rsi"]
+    sma_25, sma_75, previous_sma_75 = columns["sma_25"], columns["sma_75"], columns["previous_sma_75"]
+    macd_line, macd_signal = columns["macd_line"], columns["macd_signal"]
+    adx, dmp, dmn = columns["adx"], columns["dmp"], columns["dmn"]
+
+    deviation_rate_25 = ((price - sma_25) / sma_25) * 100
+    strong_trend = adx > params["adx_threshold"]
+
+    # 各シグナルについて、成立した分岐の番号を求める（条件の並びは _SIGNAL_TABLE の分岐順と対応）
+    buckets = {
+        'RSI': _bucket([
+            rsi < params["rsi_buy_threshold"],
+            (params["rsi_buy_threshold"] <= rsi) & (rsi < params["rsi_buy_prepare_threshold"]),
+            rsi > params["rsi_sell_threshold"],
+            (params["rsi_sell_prepare_threshold"] <= rsi) & (rsi <= params["rsi_sell_threshold"]),
+        ]),
+        'Divergence_25d': _bucket([
+            deviation_rate_25 <= params["deviation_buy_threshold"],
+            deviation_rate_25 >= params["deviation_sell_threshold"],
+        ]),
+        'MA75_Trend': _bucket([sma_75 > previous_sma_75, sma_75 < previous_sma_75]),
+        'MACD': _bucket([macd_line > macd_signal]),
+        'DMI': _bucket([dmp > dmn]),
+        'ADX': _bucket([strong_trend & (dmp > dmn), strong_trend & (dmp < dmn)]),
+    }
+
+    buy_score = np.zeros(len(tickers), dtype=np.int64)
+    short_score = np.zeros(len(tickers), dtype=np.int64)
+    signal_labels = {}
+    for name, bucket in buckets.items():
+        labels, buy_points, short_points = _SIGNAL_TABLE[name]
+        buy_score += buy_points[bucket]
+        short_score += short_points[bucket]
+        signal_labels[name] = labels[bucket].tolist()
+
+    # Pythonのスカラーに戻してから銘柄ごとのフラットな辞書に詰める
+    price, rsi, deviation_rate_25 = price.tolist(), rsi.tolist(), deviation_rate_25.tolist()
+    macd_line, macd_signal = macd_line.tolist(), macd_signal.tolist()
+    adx, dmp, dmn = adx.tolist(), dmp.tolist(), dmn.tolist()
+    volume = columns["volume"].tolist()
+    buy_score, short_score = buy_score.tolist(), short_score.tolist()
+
+    results = {}
+    for i, ticker in enumerate(tickers):
+        signals = {name: labels[i] for name, labels in signal_labels.items()}
+        results[ticker] = {
+            "ticker": metrics_by_ticker[ticker]["ticker"],
+            "price": price[i],
+            "rsi": rsi[i],
+            "deviation_rate_25": deviation_rate_25[i],
+            "trend": signals['MA75_Trend'],
+            "macd_line": macd_line[i],
+            "macd_signal": macd_signal[i],
+            "dmi_dmp": dmp[i],
+            "dmi_dmn": dmn[i],
+            "adx": adx[i],
+            "volume": volume[i],
             "signals": signals,
-            "buy_score": buy_score,
-            "short_score": short_score,
+            "buy_score": buy_score[i],
+            "short_score": short_score[i],
             "parameters_used": params
         }
+    return results
+
+def _build_price_arrays(multi_data):
+    """MultiIndexの日足データを、項目ごとの ndarray[n_tickers, n_rows]（1行が1銘柄）に一度だけ変換します。
+
+    指標の計算には単精度で十分なため float32 で保持し、メモリ量とワーカーへの転送量を半分にします。
+    出来高は欠損の判定にだけ使います（float32 では2^24を超える値が丸められるため、保存する値は _last_valid_values で倍精度のまま取り出します）。
+    """
+    columns = multi_data['Close'].columns
+    arrays = {
+        field.lower(): np.ascontiguousarray(multi_data[field][columns].to_numpy(dtype=np.float32).T)
+        for field in ('High', 'Low', 'Close', 'Volume')
+    }
+    return columns, arrays
+
+def _last_valid_values(multi_data, columns, valid, field):
+    """各銘柄の最終の有効な足（欠損の無い足）における field の値を、倍精度のまま ndarray[n_tickers] で返します。"""
+    values = multi_data[field][columns].to_numpy(dtype=np.float64)
+    last_row = valid.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    return values[last_row, np.arange(len(columns))]
+
+class _ReemitHandler(logging.Handler):
+    """ワーカープロセスから受け取ったログレコードを、このプロセスの同名のロガーから出力し直すハンドラ。"""
+    def emit(self, record):
+        logging.getLogger(record.name).handle(record)
+
+def _init_worker(log_queue, log_level):
+    """ProcessPoolExecutorのinitializer。ワーカーのログは log_queue に送り、親プロセスのロギング設定で出力させます。"""
+    root_logger = logging.getLogger()
+    root_logger.handlers.clear()
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(log_level)
+
+def _calculate_metrics_worker(payload, params):
+    """1銘柄分の欠損を除いた日足 (float32) から指標を計算します。プロセスプールのワーカーとしても使います。
+
+    履歴状態がキャッシュから渡されなかった場合はここで計算し、指標と合わせて返します。
+    """
+    ticker_yf, high, low, close, price_at_time, volume, state = payload
+    # 指標の計算は1銘柄分（100本程度）だけ倍精度に戻して行う
+    high, low, close = (values.astype(np.float64) for values in (high, low, close))
+    if state is None:
+        state = compute_history_state(high[:-1], low[:-1], close[:-1], params)
+    metrics = calculate_metrics_for_ticker(ticker_yf, high, low, close, volume, price_at_time, params, state)
+    return metrics, state
+
+# プロセス全体で使い回す分析用のプロセスプール。履歴状態の再計算が ANALYSIS_POOL_MIN_MISSES 銘柄以上のときに初めて作成する
+_analysis_executor = None
+_analysis_executor_lock = threading.Lock()
+
+def _get_analysis_executor():
+    """分析用のプロセスプールを返します。未作成の場合は、ワーカーのログを受け取るリスナーと合わせて作成します。"""
+    global _analysis_executor
+    with _analysis_executor_lock:
+        if _analysis_executor is None:
+            log_queue = _MP_CONTEXT.Queue()
+            QueueListener(log_queue, _ReemitHandler()).start()
+            _analysis_executor = ProcessPoolExecutor(
+                max_workers=ANALYSIS_MAX_WORKERS,
+                mp_context=_MP_CONTEXT,
+                initializer=_init_worker,
+                initargs=(log_queue, logging.getLogger().getEffectiveLevel()),
+            )
+        return _analysis_executor
+
+def _calculate_all_metrics(payloads, params):
+    """全銘柄の指標を計算し、payloads と同じ順の (指標, 履歴状態) のリストを返します。
+
+    履歴状態を計算し直す銘柄が ANALYSIS_POOL_MIN_MISSES 未満なら同じプロセス内で、それ以上ならプロセスプールで計算します。
+    """
+    global _analysis_executor
+    miss_count = sum(payload[-1] is None for payload in payloads)
+    if miss_count < ANALYSIS_POOL_MIN_MISSES:
+        logger.info("Starting analysis for %d tickers in process...", len(payloads))
+        return [_calculate_metrics_worker(payload, params) for payload in payloads]
+
+    logger.info("Starting analysis for %d tickers with %d workers...", len(payloads), ANALYSIS_MAX_WORKERS)
+    executor = _get_analysis_executor()
+    try:
+        return list(executor.map(_calculate_metrics_worker, payloads, itertools.repeat(params), chunksize=64))
+    except BrokenProcessPool:
+        # ワーカーが異常終了したプールは使えないため、次回は作り直す
+        with _analysis_executor_lock:
+            if _analysis_executor is executor:
+                _analysis_executor = None
+        raise
+
+def _indicator_state_path():
+    """当日分の履歴状態キャッシュのファイルパスを返します。"""
+    return os.path.join(CACHE_DIR, f"indicator_state_{date.today().isoformat()}.parquet")
+
+def load_indicator_states():
+    """当日分の履歴状態キャッシュを読み込みます。存在しない場合や読み込めない場合は空の辞書を返します。"""
+    path = _indicator_state_path()
+    if not os.path.exists(path):
+        return {}
+    try:
+        return pd.read_parquet(path).to_dict(orient='index')
     except Exception as e:
-        logging.error(f"Error processing data for {ticker}: {e}")
-        return None
+        logger.warning("Failed to read indicator state cache %s. Error: %s", path, e)
+        return {}
+
+def save_indicator_states(states):
+    """銘柄ごとの履歴状態を当日分のキャッシュとしてParquetに保存します。"""
+    path = _indicator_state_path()
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        pd.DataFrame.from_dict(states, orient='index').to_parquet(path)
+        _remove_stale_cache_files("indicator_state_")
+    except Exception as e:
+        logger.warning("Failed to write indicator state cache %s. Error: %s", path, e)
 
 def get_tickers_data(db: Session):
     """ティッカーリストの読み込み、株価データのダウンロード、テクニカル指標の計算までの一連の処理を実行します。"""
-    logging.info("Starting main data retrieval and analysis process...")
+    logger.info("Starting main data retrieval and analysis process...")
     params = get_tuning_parameters(db)
     
     tickers = read_tickers_from_csv()
     if tickers is None: 
-        logging.error("Ticker list is empty. Aborting.")
+        logger.error("Ticker list is empty. Aborting.")
         return None
 
-    yf_tickers = [f"{t}.T" if not t.startswith('^') else t for t in tickers]
+    yf_tickers = to_yf_tickers(tickers)
     multi_data, intra_day_data = download_stock_data(yf_tickers)
     if multi_data is None or intra_day_data is None or multi_data.empty:
-        logging.error('Failed to download stock data or data is empty. Aborting.')
+        logger.error('Failed to download stock data or data is empty. Aborting.')
         return None
 
-    results = {}
-    logging.info(f"Starting analysis for {len(tickers)} tickers...")
+    # 日足データを銘柄×日付の配列に一度だけ変換し、欠損チェックと日数チェックもまとめて行う
+    columns, arrays = _build_price_arrays(multi_data)
+    ticker_idx = {t: i for i, t in enumerate(columns)}
+    valid = ~np.logical_or.reduce([np.isnan(a) for a in arrays.values()])
+    has_enough_data = valid.sum(axis=1) >= params["sma_long_length"]
+    # DBに保存する出来高と、TARGET_TIME時点の株価が無い場合に使う終値は float32 の配列ではなく元のデータから取る
+    last_closes = _last_valid_values(multi_data, columns, valid, 'Close')
+    last_volumes = _last_valid_values(multi_data, columns, valid, 'Volume')
+
+    # TARGET_TIMEのタイムスタンプと全銘柄の株価は、銘柄ループの外で一度だけ求める。
+    # 休日や翌朝に実行しても、分足データの取引日のTARGET_TIMEを参照する。
+    close_intra = None
+    target_ts = None
+    if not intra_day_data.empty:
+        close_intra = intra_day_data['Close']
+        session_date = close_intra.index[-1].tz_convert('Asia/Tokyo').date()
+        target_ts = pd.Timestamp.combine(session_date, _TARGET_TIME_ONLY).tz_localize('Asia/Tokyo')
+    prices_at_time = get_prices_at_time(close_intra, target_ts)
+
+    # 当日の前回実行で求めた履歴状態を読み込み、履歴データが変わっていない銘柄だけ再利用する
+    cached_states = load_indicator_states()
+
+    analyzed_tickers = []
+    payloads = []
     for ticker, ticker_yf in zip(tickers, yf_tickers):
-        if ticker_yf not in multi_data['Close'].columns:
-            logging.warning(f"Data for ticker {ticker_yf} not found in downloaded data. Skipping.")
+        i = ticker_idx.get(ticker_yf)
+        if i is None:
+            logger.warning("Data for ticker %s not found in downloaded data. Skipping.", ticker_yf)
             continue
-        
-        metrics = calculate_metrics_for_ticker(ticker_yf, multi_data, intra_day_data, params)
+        if not has_enough_data[i]:
+            logger.warning("Skipping %s: insufficient data (less than %d days).", ticker_yf, params['sma_long_length'])
+            continue
+
+        price_at_time = prices_at_time.get(ticker_yf, float(last_closes[i]))
+        high, low, close = (arrays[field][i, valid[i]] for field in ('high', 'low', 'close'))
+        state = cached_states.get(ticker_yf)
+        if not is_history_state_valid(state, high[:-1], low[:-1], close[:-1], params):
+            state = None
+        analyzed_tickers.append(ticker)
+        payloads.append((ticker_yf, high, low, close, price_at_time, float(last_volumes[i]), state))
+
+    metrics_by_ticker = {}
+    states = {}
+    outputs = _calculate_all_metrics(payloads, params)
+    for ticker, payload, (metrics, state) in zip(analyzed_tickers, payloads, outputs):
+        states[payload[0]] = state
         if metrics:
-            results[ticker] = metrics
+            metrics_by_ticker[ticker] = metrics
+
+    reused_count = sum(payload[-1] is not None for payload in payloads)
+    logger.info("Reused cached indicator state for %d of %d tickers.", reused_count, len(payloads))
+    if reused_count < len(payloads):
+        save_indicator_states(states)
 
-    logging.info(f"Analysis complete. Successfully processed {len(results)} tickers.")
+    results = score_metrics(metrics_by_ticker, params)
+    logger.info("Analysis complete. Successfully processed %d tickers.", len(results))
     return results
\ No newline at end of file
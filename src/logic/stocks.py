@@ -1,87 +1,432 @@
+import asyncio
+import json
 import logging
-import yfinance as yf
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
+import threading
+from collections import namedtuple
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Optional
+from cachetools import TTLCache
+from yfinance.data import YfData
+from yfinance.exceptions import YFException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import desc, select, func, or_, bindparam
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import SQLAlchemyError
 
-from ..models.db_models import AnalysisResult, AnalysisRun
+from ..database import AsyncSessionLocal
+from ..models.db_models import AnalysisResult, AnalysisRun, TickerInfoCache
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
-def _enrich_results(results: list, latest_run: AnalysisRun) -> list:
+# yfinanceの企業情報取得の同時実行数（プロセス全体）
+INFO_FETCH_MAX_WORKERS = 16
+# 既定のスレッドプールはCPU数に応じて小さくなるため、I/O待ち専用のプールをプロセス全体で共有する
+_INFO_FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=INFO_FETCH_MAX_WORKERS, thread_name_prefix="info-fetch")
+# quote APIの1リクエストで問い合わせる銘柄数
+QUOTE_BATCH_SIZE = 20
+_QUOTE_URL = "https://query1.finance.yahoo.com/v7/finance/quote"
+_QUOTE_SUMMARY_URL = "https://query2.finance.yahoo.com/v10/finance/quoteSummary/"
+# レスポンスに含める企業情報の項目
+_SELECTED_FIELDS = ("website", "industry", "sector", "longBusinessSummary", "shortName", "longName", "recommendationKey")
+# 企業情報の取得で想定する失敗（通信エラーはOSErrorの派生、JSONの不正はValueError、想定外の応答形式はKeyErrorなど）
+_INFO_FETCH_ERRORS = (OSError, ValueError, KeyError, IndexError, TypeError, YFException)
+
+# 企業情報はほぼ変化しないため、必要な項目だけに絞ったものを1時間キャッシュする。
+# TTLCacheはスレッドセーフではないため、参照・更新はロック内で行う。
+_INFO_CACHE = TTLCache(maxsize=4096, ttl=3600)
+_info_cache_lock = threading.Lock()
+# プロセス内のキャッシュに無い場合の2段目のキャッシュとして、データベース (ticker_info_cache) に保存した企業情報を使う期間
+INFO_DB_CACHE_TTL = timedelta(hours=24)
+
+# 最新の分析実行は分析タスクの完了時にしか変わらないため、セッションに紐づかない軽量な値として短時間キャッシュする。
+# 分析タスクの完了時には invalidate_latest_run_cache で破棄する
+LatestRun = namedtuple("LatestRun", ["id", "analyzed_at", "parameters_used"])
+_LATEST_RUN_CACHE = TTLCache(maxsize=1, ttl=60)
+_latest_run_cache_lock = threading.Lock()
+
+# 検索結果（企業情報を付加済みのレスポンス）は最新の実行IDと検索条件が同じなら変わらないため、短時間キャッシュする。
+# 同じ条件の同時リクエストでデータベースの検索と企業情報の取得が重複しないよう、計算中は条件ごとの asyncio.Lock で待たせる。
+# 分析タスクの完了時には invalidate_search_cache で破棄する
+_SEARCH_CACHE = TTLCache(maxsize=256, ttl=60)
+_search_cache_lock = threading.Lock()
+# 検索条件ごとの [asyncio.Lock, 待機中または保持中のリクエスト数]。参照はイベントループ上だけで行う
+_search_locks = {}
+
+# 分析結果を辞書に変換する際のカラム名。テーブル定義の走査は行ごとではなく一度だけ行う
+_RESULT_COLS = tuple(column.name for column in AnalysisResult.__table__.columns)
+
+def _chunked(items: list, size: int):
+    """リストを先頭から size 件ずつのリストに分けて返すジェネレータ。"""
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def _fetch_quote_names(symbols: list) -> Optional[dict]:
+    """
+    Yahoo Financeの複数銘柄対応のquote APIで、最大 QUOTE_BATCH_SIZE 銘柄分の銘柄名を1リクエストで取得する内部関数。
+    取得に失敗した場合はNoneを返します（応答に含まれなかった銘柄は、銘柄名が無いものとして辞書に含めません）。
+    """
+    try:
+        result = YfData().get_raw_json(_QUOTE_URL, params={"symbols": ",".join(symbols), "formatted": "false"})
+        quotes = result["quoteResponse"]["result"]
+    except _INFO_FETCH_ERRORS as e:
+        logger.error("Could not fetch quotes for %d symbols: %s", len(symbols), e)
+        return None
+    return {
+        quote["symbol"]: {"shortName": quote.get("shortName"), "longName": quote.get("longName")}
+        for quote in quotes
+    }
+
+def _fetch_profile(symbol: str) -> Optional[dict]:
+    """
+    quoteSummary APIから、企業概要と推奨度の項目だけを1銘柄分取得する内部関数。
+    取得に失敗した場合はNoneを返します。
+    """
+    try:
+        result = YfData().get_raw_json(_QUOTE_SUMMARY_URL + symbol, params={"modules": "assetProfile,financialData", "formatted": "false"})
+        data = result["quoteSummary"]["result"][0]
+    except _INFO_FETCH_ERRORS as e:
+        logger.error("Could not fetch profile for %s: %s", symbol, e)
+        return None
+    profile = data.get("assetProfile") or {}
+    return {
+        "website": profile.get("website"),
+        "industry": profile.get("industry"),
+        "sector": profile.get("sector"),
+        "longBusinessSummary": profile.get("longBusinessSummary"),
+        "recommendationKey": (data.get("financialData") or {}).get("recommendationKey"),
+    }
+
+async def _run_blocking(func, *args):
+    """
+    ブロッキングI/Oを行う関数を、企業情報取得用のスレッドプールで実行する内部関数。
+    イベントループをブロックせず、Yahoo Financeへの同時リクエスト数はプロセス全体で INFO_FETCH_MAX_WORKERS に抑えます。
+    """
+    return await asyncio.get_running_loop().run_in_executor(_INFO_FETCH_EXECUTOR, func, *args)
+
+async def _batch_fetch_info(tickers: list) -> tuple:
     """
-    分析結果のリストに企業情報と実行情報を付加する内部関数。
+    複数銘柄の企業情報をまとめて取得し、必要な項目だけをティッカーをキーとする辞書で返す内部関数。
+    銘柄名の取得に失敗した銘柄の企業情報は銘柄名を欠くため、キャッシュしてよい銘柄の集合と合わせて
+    (企業情報の辞書, キャッシュしてよいティッカーの集合) を返します。
+
+    銘柄名は QUOTE_BATCH_SIZE 銘柄ずつ1リクエストで取得し、quote APIに含まれない企業概要は
+    銘柄ごとに必要なモジュールだけを取得します（yfinanceの .info は1銘柄で2リクエストを要するため）。
+    いずれもI/O待ちが支配的なため、asyncio.gather で並行して行います。
+    ティッカーは分析結果に保存されているyfinance形式（例: 7203.T）のまま問い合わせます。
+    企業概要を取得できなかった銘柄は結果に含みません。
+    """
+    chunks = list(_chunked(tickers, QUOTE_BATCH_SIZE))
+    name_tasks = [_run_blocking(_fetch_quote_names, chunk) for chunk in chunks]
+    profile_tasks = [_run_blocking(_fetch_profile, ticker) for ticker in tickers]
+    fetched = await asyncio.gather(*name_tasks, *profile_tasks)
+    names = {}
+    names_fetched = set()
+    for chunk, chunk_names in zip(chunks, fetched[:len(name_tasks)]):
+        if chunk_names is not None:
+            names.update(chunk_names)
+            names_fetched.update(chunk)
+    profiles = fetched[len(name_tasks):]
+
+    debug_enabled = logger.isEnabledFor(logging.DEBUG)
+    info_map = {}
+    for ticker, profile in zip(tickers, profiles):
+        if profile is None:
+            continue
+        info = {**profile, **names.get(ticker, {})}
+        info_map[ticker] = {field: info.get(field) for field in _SELECTED_FIELDS}
+        if debug_enabled:
+            logger.debug("Enriched data for %s", ticker)
+    return info_map, names_fetched.intersection(info_map)
+
+async def _load_persisted_infos(tickers: list) -> dict:
+    """
+    データベースに保存された企業情報のうち、INFO_DB_CACHE_TTL 以内に取得したものを返す内部関数。
+    データベースを参照できない場合は空の辞書を返します（Yahoo Financeから取得し直す）。
     """
+    fetched_after = datetime.now(timezone.utc) - INFO_DB_CACHE_TTL
+    try:
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                select(TickerInfoCache.ticker, TickerInfoCache.info)
+                .where(TickerInfoCache.ticker.in_(tickers), TickerInfoCache.fetched_at > fetched_after)
+            )).all()
+    except SQLAlchemyError as e:
+        logger.warning("Could not read ticker info cache: %s", e)
+        return {}
+    return {ticker: info for ticker, info in rows}
+
+async def _persist_infos(infos: dict):
+    """取得した企業情報をデータベースに保存（既存の行は更新）する内部関数。失敗しても処理は続行します。"""
+    if not infos:
+        return
+    fetched_at = datetime.now(timezone.utc)
+    values = [{"ticker": ticker, "info": info, "fetched_at": fetched_at} for ticker, info in infos.items()]
+    try:
+        async with AsyncSessionLocal() as session:
+            dialect = session.bind.dialect.name
+            if dialect in ("postgresql", "sqlite"):
+                insert = postgresql_insert if dialect == "postgresql" else sqlite_insert
+                statement = insert(TickerInfoCache).values(values)
+                statement = statement.on_conflict_do_update(
+                    index_elements=[TickerInfoCache.ticker],
+                    set_={"info": statement.excluded.info, "fetched_at": statement.excluded.fetched_at},
+                )
+                await session.execute(statement)
+            else:
+                for value in values:
+                    await session.merge(TickerInfoCache(**value))
+            await session.commit()
+    except SQLAlchemyError as e:
+        logger.warning("Could not write ticker info cache: %s", e)
+
+async def _lookup_cached_infos(tickers: list) -> tuple:
+    """
+    重複を除いた銘柄のうち、キャッシュにある企業情報の辞書と、キャッシュに無い銘柄のリストを返す内部関数。
+    プロセス内のキャッシュに無い銘柄はデータベースに保存された企業情報も確認し、見つかればプロセス内のキャッシュに戻します。
+    日経平均 (^N225) などの指数は企業情報が無いため、どちらにも含めません。
+    """
+    unique_tickers = [ticker for ticker in dict.fromkeys(tickers) if not ticker.startswith("^")]
+    info_map = {}
+    with _info_cache_lock:
+        for ticker in unique_tickers:
+            cached_info = _INFO_CACHE.get(ticker)
+            if cached_info is not None:
+                info_map[ticker] = cached_info
+    missing_tickers = [ticker for ticker in unique_tickers if ticker not in info_map]
+    if missing_tickers:
+        persisted_infos = await _load_persisted_infos(missing_tickers)
+        if persisted_infos:
+            with _info_cache_lock:
+                _INFO_CACHE.update(persisted_infos)
+            info_map.update(persisted_infos)
+            missing_tickers = [ticker for ticker in missing_tickers if ticker not in persisted_infos]
+    return info_map, missing_tickers
+
+async def _fetch_and_cache_infos(tickers: list) -> dict:
+    """
+    _batch_fetch_info で企業情報を取得し、プロセス内のキャッシュとデータベースに格納する内部関数
+    （企業概要または銘柄名の取得に失敗した銘柄は格納せず、次回に取得し直します）。
+    """
+    fetched_infos, cacheable_tickers = await _batch_fetch_info(tickers)
+    cacheable_infos = {ticker: fetched_infos[ticker] for ticker in cacheable_tickers}
+    with _info_cache_lock:
+        _INFO_CACHE.update(cacheable_infos)
+    await _persist_infos(cacheable_infos)
+    return fetched_infos
+
+async def _fetch_infos(tickers: list) -> dict:
+    """
+    複数銘柄の企業情報を取得し、ティッカーをキーとする辞書で返す内部関数。
+    キャッシュに無い銘柄だけをまとめて取得します。
+    """
+    info_map, missing_tickers = await _lookup_cached_infos(tickers)
+    if missing_tickers:
+        info_map.update(await _fetch_and_cache_infos(missing_tickers))
+    return info_map
+
+def invalidate_latest_run_cache():
+    """キャッシュした最新の分析実行を破棄します。新しい分析結果を保存した後に呼び出します。"""
+    with _latest_run_cache_lock:
+        _LATEST_RUN_CACHE.clear()
+
+def invalidate_search_cache():
+    """キャッシュした検索結果を破棄します。新しい分析結果を保存した後に呼び出します。"""
+    with _search_cache_lock:
+        _SEARCH_CACHE.clear()
+
+def _get_cached_search(key: tuple) -> Optional[list]:
+    """キャッシュした検索結果を返す内部関数。無ければNoneを返します。"""
+    with _search_cache_lock:
+        return _SEARCH_CACHE.get(key)
+
+@asynccontextmanager
+async def _search_lock(key: tuple):
+    """
+    検索条件ごとの asyncio.Lock を取得する内部の非同期コンテキストマネージャ。
+    ロックは保持中・待機中のリクエストが無くなった時点で破棄します（計算中に別のロックが作られることはありません）。
+    """
+    entry = _search_locks.get(key)
+    if entry is None:
+        entry = _search_locks[key] = [asyncio.Lock(), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _search_locks[key]
+
+def _cache_latest_run(latest_run: LatestRun):
+    """最新の分析実行をキャッシュに格納する内部関数。"""
+    with _latest_run_cache_lock:
+        _LATEST_RUN_CACHE["latest"] = latest_run
+
+async def _get_latest_run(db: AsyncSession) -> Optional[LatestRun]:
+    """
+    最新の分析実行を、キャッシュに無ければデータベースから取得して返す内部関数。
+    分析実行が1件も無い場合はNoneを返します（キャッシュしません）。
+    """
+    with _latest_run_cache_lock:
+        latest_run = _LATEST_RUN_CACHE.get("latest")
+    if latest_run is not None:
+        return latest_run
+
+    row = (await db.execute(_LATEST_RUN_STATEMENT)).mappings().first()
+    if row is None:
+        return None
+    latest_run = LatestRun(row["id"], row["analyzed_at"], row["parameters_used"])
+    _cache_latest_run(latest_run)
+    return latest_run
+
+def _enrich_results(rows: list, latest_run: LatestRun, info_map: dict) -> list:
+    """
+    分析結果の行（RowMapping）のリストに、_fetch_infos で取得した企業情報と実行情報を付加する内部関数。
+    """
+    analyzed_at = latest_run.analyzed_at
+    parameters_used = latest_run.parameters_used
     enriched_results = []
-    for result in results:
-        enriched_result = {col.name: getattr(result, col.name) for col in result.__table__.columns}
-        enriched_result["analyzed_at"] = latest_run.analyzed_at
-        enriched_result["parameters_used"] = latest_run.parameters_used
-        
-        try:
-            if result.ticker == "^N225":
-                enriched_result['info'] = {}
-                enriched_results.append(enriched_result)
-                continue
-
-            ticker_yf = f"{result.ticker}.T"
-            ticker_obj = yf.Ticker(ticker_yf)
-            info = ticker_obj.info
-            selected_fields = ["website", "industry", "sector", "longBusinessSummary", "shortName", "longName", "recommendationKey"]
-            enriched_result['info'] = {field: info.get(field) for field in selected_fields}
-            enriched_results.append(enriched_result)
-            logger.debug(f"Enriched data for {result.ticker}")
-
-        except Exception as e:
-            logger.error(f"Could not fetch 'info' for {result.ticker}: {e}")
-            enriched_result['info'] = {}
-            enriched_results.append(enriched_result)
+    for row in rows:
+        enriched_result = {col: row[col] for col in _RESULT_COLS}
+        enriched_result["analyzed_at"] = analyzed_at
+        enriched_result["parameters_used"] = parameters_used
+        enriched_result['info'] = info_map.get(row["ticker"], {})
+        enriched_results.append(enriched_result)
     return enriched_results
 
-def get_top_stocks_summary(db: Session, top_n: int = 5):
+def _build_top_stocks_statement():
+    """
+    最新の実行、買いスコア上位、空売りスコア上位を1つのクエリ（1往復）でまとめて取得するSELECT文を組み立てます。
+    最新の実行の分析結果に買い・空売りスコアそれぞれの順位 (ROW_NUMBER) を付け、いずれかの順位が top_n 以内の行だけを返します
+    （両方の上位に入る銘柄も1行で返ります）。件数はバインドパラメータ top_n で渡します。
+    ORMオブジェクトを介さず、分析結果のカラムと実行情報 (analyzed_at, parameters_used)、順位 (buy_rank, short_rank) を行として返します。
+    """
+    runs = AnalysisRun.__table__
+    results = AnalysisResult.__table__
+    latest_run_cte = select(runs.c.id, runs.c.analyzed_at, runs.c.parameters_used)\
+        .order_by(desc(runs.c.analyzed_at))\
+        .limit(1)\
+        .cte("latest_run")
+
+    ranked = select(
+        results,
+        latest_run_cte.c.analyzed_at,
+        latest_run_cte.c.parameters_used,
+        func.row_number().over(order_by=desc(results.c.buy_score)).label("buy_rank"),
+        func.row_number().over(order_by=desc(results.c.short_score)).label("short_rank"),
+    )\
+        .join(latest_run_cte, results.c.analysis_run_id == latest_run_cte.c.id)\
+        .subquery("ranked")
+    top_n = bindparam("top_n")
+    return select(ranked).where(or_(ranked.c.buy_rank <= top_n, ranked.c.short_rank <= top_n))
+
+def _search_statement(sort_by: str, sort_order: str, filter_buy_score: bool, filter_short_score: bool):
+    """
+    検索条件の組み合わせごとに一度だけ組み立てたSELECT文を返します。
+    実行ID・スコアの下限・件数はバインドパラメータ (run_id, min_buy_score, min_short_score, limit) で渡します。
+    """
+    key = (sort_by == "buy_score", sort_order == "desc", filter_buy_score, filter_short_score)
+    statement = _SEARCH_STATEMENTS.get(key)
+    if statement is None:
+        sort_by_buy_score, descending = key[0], key[1]
+        results = AnalysisResult.__table__
+        statement = select(results).where(results.c.analysis_run_id == bindparam("run_id"))
+        if filter_buy_score:
+            statement = statement.where(results.c.buy_score >= bindparam("min_buy_score"))
+        if filter_short_score:
+            statement = statement.where(results.c.short_score >= bindparam("min_short_score"))
+        sort_column = results.c.buy_score if sort_by_buy_score else results.c.short_score
+        statement = statement.order_by(desc(sort_column) if descending else sort_column).limit(bindparam("limit"))
+        _SEARCH_STATEMENTS[key] = statement
+    return statement
+
+# 値をバインドパラメータで渡すSELECT文は、組み立てを一度だけ行って使い回す
+# （SQLAlchemyのコンパイル済みSQLキャッシュも同じ文として再利用される）。
+# 読み取り専用のため、いずれもORMオブジェクトではなくテーブルに対するCoreのSELECT文とする
+_LATEST_RUN_STATEMENT = select(AnalysisRun.__table__).order_by(desc(AnalysisRun.__table__.c.analyzed_at)).limit(1)
+_TOP_STOCKS_STATEMENT = _build_top_stocks_statement()
+_SEARCH_STATEMENTS = {}
+
+async def get_top_stocks_summary(db: AsyncSession, top_n: int = 5):
     """
     最新の分析結果から、買いスコアと空売りスコアがトップNの銘柄リストを取得します。
 
     Args:
-        db (Session): データベースセッション。
+        db (AsyncSession): 非同期データベースセッション。
         top_n (int): 上位何件を取得するか。
 
     Returns:
         dict: "top_buys"と"top_shorts"をキーに持つ辞書。
     """
-    logger.info(f"Fetching top {top_n} stocks summary...")
+    logger.info("Fetching top %d stocks summary...", top_n)
     try:
-        latest_run = db.query(AnalysisRun).order_by(desc(AnalysisRun.analyzed_at)).first()
-        if not latest_run:
-            logger.warning("No analysis runs found in the database.")
+        rows = (await db.execute(_TOP_STOCKS_STATEMENT, {"top_n": top_n})).mappings().all()
+        if not rows:
+            logger.warning("No analysis results found for the latest run.")
             return {"top_buys": [], "top_shorts": []}
 
-        # Top N Buy Score
-        top_buys_query = db.query(AnalysisResult)\
-            .filter(AnalysisResult.analysis_run_id == latest_run.id)\
-            .order_by(desc(AnalysisResult.buy_score))\
-            .limit(top_n)\
-            .all()
-
-        # Top N Short Score
-        top_shorts_query = db.query(AnalysisResult)\
-            .filter(AnalysisResult.analysis_run_id == latest_run.id)\
-            .order_by(desc(AnalysisResult.short_score))\
-            .limit(top_n)\
-            .all()
-            
-        enriched_buys = _enrich_results(top_buys_query, latest_run)
-        enriched_shorts = _enrich_results(top_shorts_query, latest_run)
+        # 最新の実行情報は各行に含まれるため、検索用にキャッシュしておく
+        latest_run = LatestRun(rows[0]["analysis_run_id"], rows[0]["analyzed_at"], rows[0]["parameters_used"])
+        _cache_latest_run(latest_run)
+        top_buys_query = sorted((row for row in rows if row["buy_rank"] <= top_n), key=lambda row: row["buy_rank"])
+        top_shorts_query = sorted((row for row in rows if row["short_rank"] <= top_n), key=lambda row: row["short_rank"])
+
+        # 買い/空売りの両方に現れる銘柄も含め、企業情報は1回の並行取得でまとめて取得する
+        info_map = await _fetch_infos([row["ticker"] for row in rows])
+        enriched_buys = _enrich_results(top_buys_query, latest_run, info_map)
+        enriched_shorts = _enrich_results(top_shorts_query, latest_run, info_map)
 
         logger.info("Successfully fetched top stocks summary.")
         return {"top_buys": enriched_buys, "top_shorts": enriched_shorts}
 
     except Exception as e:
-        logger.error(f"An error occurred while fetching top stocks summary: {e}", exc_info=True)
+        logger.error("An error occurred while fetching top stocks summary: %s", e, exc_info=True)
         return {"top_buys": [], "top_shorts": []}
 
 
-def search_stocks(
-    db: Session,
+async def _query_run_results(db: AsyncSession, latest_run: LatestRun, min_buy_score: int, min_short_score: int, sort_by: str, sort_order: str, limit: int) -> list:
+    """
+    指定した分析実行に紐づく分析結果のうち、検索条件に合う行（RowMapping）のリストを返す内部関数。
+    """
+    logger.info("Querying results for the latest analysis run: %s at %s", latest_run.id, latest_run.analyzed_at)
+
+    # 最新の実行IDに紐づく分析結果を、条件に応じたフィルタリング・ソート・件数制限付きでクエリ
+    statement = _search_statement(sort_by, sort_order, min_buy_score > 0, min_short_score > 0)
+    results = (await db.execute(statement, {
+        "run_id": latest_run.id,
+        "min_buy_score": min_buy_score,
+        "min_short_score": min_short_score,
+        "limit": limit,
+    })).mappings().all()
+    logger.info("Found %d stocks matching criteria.", len(results))
+    return results
+
+async def _query_search_results(db: AsyncSession, min_buy_score: int, min_short_score: int, sort_by: str, sort_order: str, limit: int) -> tuple:
+    """
+    最新の分析実行と、それに紐づく分析結果のうち検索条件に合う行（RowMapping）のリストを返す内部関数。
+    分析実行が1件も無い場合は (None, []) を返します。
+    """
+    # 最新の分析実行を取得
+    latest_run = await _get_latest_run(db)
+    if not latest_run:
+        logger.warning("No analysis runs found in the database.")
+        return None, []
+    results = await _query_run_results(db, latest_run, min_buy_score, min_short_score, sort_by, sort_order, limit)
+    return latest_run, results
+
+async def search_stocks(
+    db: AsyncSession,
     min_buy_score: int = 0,
     min_short_score: int = 0,
     sort_by: str = "buy_score",
@@ -90,9 +435,10 @@ def search_stocks(
 ):
     """
     データベースに保存された最新の分析結果をフィルタリング、ソート、情報付加して取得します。
+    結果は最新の実行IDと検索条件ごとに短時間キャッシュします。
 
     Args:
-        db (Session): データベースセッション。
+        db (AsyncSession): 非同期データベースセッション。
         min_buy_score (int): 買いスコアの最小値。
         min_short_score (int): 空売りスコアの最小値。
         sort_by (str): ソート対象のカラム名 ('buy_score' or 'short_score').
@@ -102,43 +448,106 @@ def search_stocks(
     Returns:
         list: フィルタリング、ソート、情報付加された銘柄データのリスト。
     """
-    logger.info(f"Searching stocks with criteria: min_buy_score={min_buy_score}, min_short_score={min_short_score}, sort_by={sort_by}, limit={limit}")
+    logger.info(
+        "Searching stocks with criteria: min_buy_score=%s, min_short_score=%s, sort_by=%s, limit=%s",
+        min_buy_score, min_short_score, sort_by, limit,
+    )
 
     try:
         # 最新の分析実行を取得
-        latest_run = db.query(AnalysisRun).order_by(desc(AnalysisRun.analyzed_at)).first()
+        latest_run = await _get_latest_run(db)
         if not latest_run:
             logger.warning("No analysis runs found in the database.")
             return []
-        
-        logger.info(f"Querying results for the latest analysis run: {latest_run.id} at {latest_run.analyzed_at}")
-
-        # 最新の実行IDに紐づく分析結果をクエリ
-        query = db.query(AnalysisResult).filter(AnalysisResult.analysis_run_id == latest_run.id)
-
-        # フィルタリング
-        if min_buy_score > 0:
-            query = query.filter(AnalysisResult.buy_score >= min_buy_score)
-        if min_short_score > 0:
-            query = query.filter(AnalysisResult.short_score >= min_short_score)
-
-        # ソート
-        sort_column = AnalysisResult.buy_score if sort_by == "buy_score" else AnalysisResult.short_score
-        if sort_order == "desc":
-            query = query.order_by(desc(sort_column))
-        else:
-            query = query.order_by(sort_column)
-
-        # 取得件数制限
-        results = query.limit(limit).all()
-        logger.info(f"Found {len(results)} stocks matching criteria.")
-
-        # yfinanceで企業情報を付加
-        enriched_results = _enrich_results(results, latest_run)
-        
+
+        key = (latest_run.id, min_buy_score, min_short_score, sort_by, sort_order, limit)
+        cached_results = _get_cached_search(key)
+        if cached_results is not None:
+            logger.info("Returning cached search results.")
+            return cached_results
+
+        async with _search_lock(key):
+            # 待っている間に他のリクエストが計算を終えていれば、その結果を返す
+            cached_results = _get_cached_search(key)
+            if cached_results is not None:
+                logger.info("Returning cached search results.")
+                return cached_results
+
+            results = await _query_run_results(db, latest_run, min_buy_score, min_short_score, sort_by, sort_order, limit)
+
+            # yfinanceで企業情報を付加
+            info_map = await _fetch_infos([row["ticker"] for row in results])
+            enriched_results = _enrich_results(results, latest_run, info_map)
+            with _search_cache_lock:
+                _SEARCH_CACHE[key] = enriched_results
+
         logger.info("Stock search and enrichment completed successfully.")
         return enriched_results
 
     except Exception as e:
-        logger.error(f"An error occurred during stock search: {e}", exc_info=True)
-        return []
\ No newline at end of file
+        logger.error("An error occurred during stock search: %s", e, exc_info=True)
+        return []
+
+
+def _dumps_line(obj) -> bytes:
+    """NDJSONの1行分として、オブジェクトを改行付きのJSONバイト列に変換します。"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+    return (json.dumps(obj, ensure_ascii=False, default=str) + "\n").encode()
+
+async def _stream_enriched_results(rows: list, latest_run: LatestRun):
+    """
+    分析結果の行に企業情報を付加し、1銘柄1行のNDJSONとして順次返す非同期ジェネレータ。
+
+    企業情報がキャッシュにある銘柄（と企業情報の無い銘柄）を先に返し、残りは QUOTE_BATCH_SIZE 銘柄ずつ
+    並行して取得し、取得できたまとまりから返します。このため行の順序は検索時のソート順とは一致しません。
+    """
+    if not rows:
+        return
+    info_map, missing_tickers = await _lookup_cached_infos([row["ticker"] for row in rows])
+    missing = set(missing_tickers)
+    for enriched_result in _enrich_results([row for row in rows if row["ticker"] not in missing], latest_run, info_map):
+        yield _dumps_line(enriched_result)
+
+    rows_by_ticker = {}
+    for row in rows:
+        if row["ticker"] in missing:
+            rows_by_ticker.setdefault(row["ticker"], []).append(row)
+    tasks = [asyncio.create_task(_fetch_and_cache_infos(chunk)) for chunk in _chunked(missing_tickers, QUOTE_BATCH_SIZE)]
+    try:
+        for completed in asyncio.as_completed(tasks):
+            chunk_infos = await completed
+            chunk_rows = [row for ticker in chunk_infos for row in rows_by_ticker.pop(ticker)]
+            for enriched_result in _enrich_results(chunk_rows, latest_run, chunk_infos):
+                yield _dumps_line(enriched_result)
+        # 企業情報を取得できなかった銘柄も、情報なしで返す
+        for enriched_result in _enrich_results([row for chunk_rows in rows_by_ticker.values() for row in chunk_rows], latest_run, {}):
+            yield _dumps_line(enriched_result)
+    finally:
+        # クライアントが途中で切断した場合は、残りの取得を取り消す
+        for task in tasks:
+            task.cancel()
+
+async def stream_search_stocks(
+    db: AsyncSession,
+    min_buy_score: int = 0,
+    min_short_score: int = 0,
+    sort_by: str = "buy_score",
+    sort_order: str = "desc",
+    limit: int = 100
+):
+    """
+    search_stocks と同じ条件で分析結果を検索し、企業情報を付加した銘柄データを1件ずつNDJSONで返す非同期ジェネレータを返します。
+
+    データベースの検索はこの関数の中で済ませるため、返したジェネレータはセッションを使いません。
+    企業情報の取得を待たずに、揃った銘柄から順に返します（行の順序はソート順とは一致しません）。
+
+    Returns:
+        AsyncIterator[bytes]: 1銘柄1行のNDJSON。
+    """
+    logger.info(
+        "Streaming stocks with criteria: min_buy_score=%s, min_short_score=%s, sort_by=%s, limit=%s",
+        min_buy_score, min_short_score, sort_by, limit,
+    )
+    latest_run, results = await _query_search_results(db, min_buy_score, min_short_score, sort_by, sort_order, limit)
+    return _stream_enriched_results(results, latest_run)
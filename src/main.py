@@ -1,44 +1,102 @@
 import logging
-from logging.handlers import RotatingFileHandler
+import logging.config
+from logging.handlers import QueueHandler, QueueListener
 import os
+import queue
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from sqlalchemy import text
 from src.routers import analysis, stocks # stocksルーターをインポート
-from src.database import engine, Base
+from src.database import async_engine, Base
 from src.models import db_models
 
 # ロギング設定
 LOG_DIR = "data/logs"
 LOG_FILE = os.path.join(LOG_DIR, "app.log")
 
-# ログディレクトリが存在しない場合は作成
-os.makedirs(LOG_DIR, exist_ok=True)
+LOGGING_CONFIG = {
+    "version": 1,
+    # uvicorn等が先に作成したロガーを無効化しない
+    "disable_existing_loggers": False,
+    "formatters": {
+        "default": {"format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"},
+    },
+    "handlers": {
+        "file": {
+            "class": "logging.handlers.RotatingFileHandler",
+            "filename": LOG_FILE,
+            "maxBytes": 10 * 1024 * 1024,
+            "backupCount": 5,
+            "encoding": "utf-8",
+            "formatter": "default",
+        },
+        # コンソールにも出力（Dockerログにも出力されるように）
+        "console": {
+            "class": "logging.StreamHandler",
+            "formatter": "default",
+        },
+    },
+    "root": {"level": "INFO", "handlers": ["file", "console"]},
+}
 
 # ロガーの取得
 logger = logging.getLogger()
-logger.setLevel(logging.INFO) # デフォルトのログレベルを設定
 
-# 既存のハンドラをクリア
-if logger.hasHandlers():
-    logger.handlers.clear()
+# 起動時に設定されるキューのリスナー
+log_listener = None
 
-# ファイルハンドラの設定
-file_handler = RotatingFileHandler(LOG_FILE, maxBytes=10*1024*1024, backupCount=5, encoding='utf-8')
-file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-logger.addHandler(file_handler)
+def _setup_logging():
+    """
+    ロギングを設定します。ワーカープロセスごとに起動時に一度だけ呼び出されます。
+    ルートロガーにはQueueHandlerのみを付け、ファイル・コンソールへの書き込みはリスナーのスレッドでまとめて行います。
+    """
+    global log_listener
+    # ログディレクトリが存在しない場合は作成
+    os.makedirs(LOG_DIR, exist_ok=True)
+    # dictConfigは以前の設定で作成したハンドラを閉じてから設定し直すため、再設定してもハンドラは残らない
+    logging.config.dictConfig(LOGGING_CONFIG)
 
-# コンソールハンドラも追加（Dockerログにも出力されるように）
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-logger.addHandler(console_handler)
+    handlers = list(logger.handlers)
+    log_queue = queue.Queue(-1)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(log_queue))
+    log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    log_listener.start()
 
 
-app = FastAPI()
+# Alembic等でスキーマを管理する環境では、SKIP_CREATE_ALL=1 (true/yes) で起動時のテーブル作成を行わない
+SKIP_CREATE_ALL = os.environ.get("SKIP_CREATE_ALL", "").strip().lower() in {"1", "true", "yes"}
 
-@app.on_event("startup")
-def on_startup():
-    # データベーステーブルを作成
-    db_models.Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created or already exist.")
+# 複数ワーカーが同時にDDLを発行しないようにするためのPostgreSQLのアドバイザリロックのキー
+_CREATE_ALL_LOCK_KEY = 7240613
+
+def _create_tables(sync_conn):
+    """テーブルと、create_allでは既存テーブルに作成されないインデックスを作成します。"""
+    Base.metadata.create_all(sync_conn)
+    for index in db_models.AnalysisResult.__table__.indexes:
+        index.create(sync_conn, checkfirst=True)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    _setup_logging()
+    if SKIP_CREATE_ALL:
+        logger.info("SKIP_CREATE_ALL is set. Skipping table creation.")
+    else:
+        # データベーステーブルを作成
+        async with async_engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # トランザクション終了時に解放される
+                await conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _CREATE_ALL_LOCK_KEY})
+            await conn.run_sync(_create_tables)
+        logger.info("Database tables created or already exist.")
+    yield
+    await async_engine.dispose()
+    # キューに残ったログを書き出してからリスナーのスレッドを停止する
+    if log_listener is not None:
+        log_listener.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(analysis.router)
 app.include_router(stocks.router) # stocksルーターを追加
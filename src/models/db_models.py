@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Date, UniqueConstraint, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, Date, UniqueConstraint, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -56,3 +56,20 @@ class AnalysisResult(Base):
     short_score = Column(Integer)
 
     run = relationship("AnalysisRun", back_populates="results")
+
+    # 最新の実行IDで絞り込み、スコアの降順で上位N件を取得するクエリ用の複合インデックス
+    __table_args__ = (
+        Index('ix_result_run_buyscore', analysis_run_id, buy_score.desc()),
+        Index('ix_result_run_shortscore', analysis_run_id, short_score.desc()),
+    )
+
+class TickerInfoCache(Base):
+    """
+    yfinanceから取得した企業情報のキャッシュ。
+    プロセスの再起動後や複数ワーカー間でも、取得済みの企業情報を再利用するために使う。
+    """
+    __tablename__ = "ticker_info_cache"
+
+    ticker = Column(String, primary_key=True)
+    info = Column(JSON, nullable=False)
+    fetched_at = Column(DateTime(timezone=True), nullable=False, index=True)
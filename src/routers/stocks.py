@@ -1,10 +1,11 @@
 import logging
 from typing import List
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..logic.stocks import search_stocks, get_top_stocks_summary
-from ..database import get_db
+from ..logic.stocks import search_stocks, stream_search_stocks, get_top_stocks_summary
+from ..database import get_async_db
 from ..models.analysis import AnalysisResponse, StockSummaryResponse
 
 logger = logging.getLogger(__name__)
@@ -18,19 +19,19 @@ router = APIRouter(
 # --- API Endpoints ---
 @router.get("/summary", response_model=StockSummaryResponse)
 async def get_summary_endpoint(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     top_n: int = Query(5, description="上位何件を取得するか")
 ):
     """
     最新の分析結果から、買いスコアと空売りスコアがトップNの銘柄リストを取得します。
     """
-    logger.info(f"Received request to get top {top_n} stocks summary.")
-    summary = get_top_stocks_summary(db=db, top_n=top_n)
+    logger.info("Received request to get top %d stocks summary.", top_n)
+    summary = await get_top_stocks_summary(db=db, top_n=top_n)
     return summary
 
 @router.get("/search", response_model=AnalysisResponse)
 async def search_stocks_endpoint(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     min_buy_score: int = Query(0, description="買いスコアの最小値"),
     min_short_score: int = Query(0, description="空売りスコアの最小値"),
     sort_by: str = Query("buy_score", description="ソート対象のカラム ('buy_score' or 'short_score')"),
@@ -44,7 +45,7 @@ async def search_stocks_endpoint(
     """
     logger.info("Received request to search stocks.")
     
-    results = search_stocks(
+    results = await search_stocks(
         db=db,
         min_buy_score=min_buy_score,
         min_short_score=min_short_score,
@@ -57,3 +58,30 @@ async def search_stocks_endpoint(
         "message": f"Found {len(results)} stocks.",
         "analysis_results": results
     }
+
+@router.get("/search/stream")
+async def search_stocks_stream_endpoint(
+    db: AsyncSession = Depends(get_async_db),
+    min_buy_score: int = Query(0, description="買いスコアの最小値"),
+    min_short_score: int = Query(0, description="空売りスコアの最小値"),
+    sort_by: str = Query("buy_score", description="ソート対象のカラム ('buy_score' or 'short_score')"),
+    sort_order: str = Query("desc", description="ソート順 ('asc' or 'desc')"),
+    limit: int = Query(100, description="取得する最大件数")
+):
+    """
+    /stocks/search と同じ条件で検索し、企業情報を付加した銘柄データを1銘柄1行のNDJSONでストリーミングします。
+
+    企業情報の取得が済んだ銘柄から順に返すため、件数が多くても最初の行をすぐに受け取れます。
+    行の順序はソート順とは一致しません。
+    """
+    logger.info("Received request to stream stock search results.")
+
+    stream = await stream_search_stocks(
+        db=db,
+        min_buy_score=min_buy_score,
+        min_short_score=min_short_score,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        limit=limit
+    )
+    return StreamingResponse(stream, media_type="application/x-ndjson")
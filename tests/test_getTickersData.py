@@ -0,0 +1,39 @@
+import os
+import unittest
+import warnings
+from unittest import mock
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pandas as pd
+
+from src.logic import getTickersData
+
+
+def _frame(ticker, index, values):
+    """yf.download(group_by='column') と同じ (項目, ティッカー) 列を持つ1銘柄分のデータフレームを作ります。"""
+    columns = pd.MultiIndex.from_product([["Close", "Volume"], [ticker]])
+    return pd.DataFrame({column: values for column in columns}, index=index)
+
+
+class DownloadChunkedTest(unittest.TestCase):
+    def test_rows_sorted_when_chunks_have_different_rows(self):
+        index = pd.date_range("2026-06-01 09:00", periods=4, freq="min", tz="Asia/Tokyo")
+        # 2つ目のチャンクには、1つ目に無い（より早い）時刻の足だけがある
+        frames = {"A.T": _frame("A.T", index[[1, 3]], [10.0, 30.0]), "B.T": _frame("B.T", index[[0, 2]], [0.0, 20.0])}
+
+        with mock.patch.object(getTickersData, "DOWNLOAD_CHUNK_SIZE", 1), \
+                mock.patch.object(getTickersData.yf, "download", side_effect=lambda chunk, **kwargs: frames[chunk[0]]), \
+                warnings.catch_warnings():
+            warnings.simplefilter("error")
+            data = getTickersData._download_chunked(["A.T", "B.T"], "1d", "1m")
+
+        self.assertTrue(data.index.equals(index))
+        self.assertEqual(list(data.columns.get_level_values(0)), ["Close", "Close", "Volume", "Volume"])
+        # 昇順のインデックスに対する二分探索で、TARGET_TIME以前の最後の値を取れること
+        prices = getTickersData.get_prices_at_time(data["Close"], index[2])
+        self.assertEqual(prices, {"A.T": 10.0, "B.T": 20.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
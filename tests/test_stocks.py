@@ -0,0 +1,112 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from src.database import Base, async_engine
+from src.logic import stocks
+
+
+class _FakeYfData:
+    """Yahoo Financeへのリクエストを記録し、固定の応答を返す YfData の代わり。"""
+    requests = []
+    fail_quotes = False
+
+    def get_raw_json(self, url, params=None):
+        if url == stocks._QUOTE_URL:
+            symbols = params["symbols"].split(",")
+            self.requests.append(("quote", symbols))
+            if self.fail_quotes:
+                raise OSError("quote API unavailable")
+            return {"quoteResponse": {"result": [
+                {"symbol": symbol, "shortName": f"short {symbol}", "longName": f"long {symbol}"} for symbol in symbols
+            ]}}
+        symbol = url[len(stocks._QUOTE_SUMMARY_URL):]
+        self.requests.append(("profile", symbol))
+        return {"quoteSummary": {"result": [{
+            "assetProfile": {"sector": f"sector {symbol}"},
+            "financialData": {"recommendationKey": "buy"},
+        }]}}
+
+
+class FetchInfosTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        stocks._INFO_CACHE.clear()
+        _FakeYfData.requests = []
+        _FakeYfData.fail_quotes = False
+        patcher = mock.patch.object(stocks, "YfData", _FakeYfData)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_stored_yfinance_symbols_are_requested_as_is(self):
+        # analysis_results には yfinance 形式のティッカーが保存されている
+        info_map = await stocks._fetch_infos(["1332.T", "^N225", "1333.T"])
+
+        self.assertEqual(set(info_map), {"1332.T", "1333.T"})
+        self.assertEqual(info_map["1332.T"]["shortName"], "short 1332.T")
+        self.assertEqual(info_map["1332.T"]["sector"], "sector 1332.T")
+        requested = {symbol for kind, symbols in _FakeYfData.requests if kind == "quote" for symbol in symbols}
+        requested |= {symbol for kind, symbol in _FakeYfData.requests if kind == "profile"}
+        self.assertEqual(requested, {"1332.T", "1333.T"})
+
+        # 取得できた企業情報はキャッシュされ、再取得しない
+        _FakeYfData.requests = []
+        self.assertEqual(await stocks._fetch_infos(["1332.T"]), {"1332.T": info_map["1332.T"]})
+        self.assertEqual(_FakeYfData.requests, [])
+
+    async def test_info_without_names_is_not_cached(self):
+        _FakeYfData.fail_quotes = True
+        info_map = await stocks._fetch_infos(["1332.T"])
+
+        # 企業概要は返すが、銘柄名を欠く情報はキャッシュにもデータベースにも格納しない
+        self.assertEqual(info_map["1332.T"]["sector"], "sector 1332.T")
+        self.assertIsNone(info_map["1332.T"]["shortName"])
+        self.assertNotIn("1332.T", stocks._INFO_CACHE)
+        self.assertEqual(await stocks._load_persisted_infos(["1332.T"]), {})
+
+        # 銘柄名の取得が回復すれば、取得し直してキャッシュする
+        _FakeYfData.fail_quotes = False
+        info_map = await stocks._fetch_infos(["1332.T"])
+        self.assertEqual(info_map["1332.T"]["shortName"], "short 1332.T")
+        self.assertIn("1332.T", stocks._INFO_CACHE)
+        self.assertIn("1332.T", await stocks._load_persisted_infos(["1332.T"]))
+
+
+class SearchCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_searches_never_query_in_parallel(self):
+        stocks.invalidate_search_cache()
+        latest_run = stocks.LatestRun(1, None, {})
+        state = {"active": 0, "max_active": 0, "calls": 0}
+
+        async def query_run_results(*args):
+            state["active"] += 1
+            state["max_active"] = max(state["max_active"], state["active"])
+            await asyncio.sleep(0.01)
+            state["active"] -= 1
+            state["calls"] += 1
+            if state["calls"] == 1:
+                raise OSError("database unavailable")
+            return []
+
+        async def search(delay):
+            await asyncio.sleep(delay)
+            return await stocks.search_stocks(None)
+
+        with mock.patch.object(stocks, "_get_latest_run", mock.AsyncMock(return_value=latest_run)), \
+                mock.patch.object(stocks, "_query_run_results", query_run_results), \
+                mock.patch.object(stocks, "_fetch_infos", mock.AsyncMock(return_value={})):
+            # 最初の検索が失敗した後も、待っていたリクエストと後から来たリクエストが並行して検索しないこと
+            await asyncio.gather(*(search(i * 0.004) for i in range(8)))
+
+        self.assertEqual(state["max_active"], 1)
+        self.assertEqual(state["calls"], 2)
+        self.assertEqual(stocks._search_locks, {})
+
+
+if __name__ == "__main__":
+    unittest.main()